@@ -0,0 +1,242 @@
+# Filename: sisense_cache.py
+#
+# Shared cache tier for raw dashboard payloads and extraction results.
+# Backed by a local SQLite file so several app sessions and replicas on the
+# same host can share it safely.
+#
+# Namespaces scope entries by environment and, for anything fetched with a
+# user's token (dashboard payloads, fingerprints), by that token too. Only
+# content-addressed entries, such as extractions keyed by payload hash, use the
+# environment-wide namespace and are shared across users.
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_PATH = os.environ.get("SISENSE_CACHE_PATH", ".sisense_cache.sqlite")
+DEFAULT_MAX_BYTES = int(os.environ.get("SISENSE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+DEFAULT_TTL = 24 * 3600
+# Access times and counters are buffered and written in batches so that cache
+# hits stay read-only for SQLite.
+FLUSH_EVERY = 64
+FLUSH_INTERVAL = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (namespace, kind, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def cache_namespace(base_url, token=None):
+    """Namespace for one environment, or for one token's view of it when ``token`` is given."""
+    scope = (base_url or "").rstrip("/").lower()
+    if token:
+        scope += "\x1f" + hashlib.sha256(token.encode("utf-8")).hexdigest()
+    return hashlib.sha256(scope.encode("utf-8")).hexdigest()
+
+
+# JSON keeps the cache safe to share between users (no pickle); tuples are
+# tagged so extraction results round-trip with hashable rows.
+def _tag(obj):
+    if isinstance(obj, tuple):
+        return {"__tuple__": [_tag(v) for v in obj]}
+    if isinstance(obj, (set, frozenset)):
+        return {"__set__": sorted((_tag(v) for v in obj), key=lambda v: json.dumps(v, sort_keys=True))}
+    if isinstance(obj, list):
+        return [_tag(v) for v in obj]
+    if isinstance(obj, dict):
+        return {k: _tag(v) for k, v in obj.items()}
+    return obj
+
+
+def _untag(obj):
+    if "__tuple__" in obj:
+        return tuple(obj["__tuple__"])
+    if "__set__" in obj:
+        return frozenset(obj["__set__"])
+    return obj
+
+
+def encode(value):
+    return zlib.compress(json.dumps(_tag(value), separators=(",", ":")).encode("utf-8"))
+
+
+def decode(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"), object_hook=_untag)
+
+
+class SqliteCache:
+    """Size-bounded LRU cache with TTLs, shared across processes through one SQLite file."""
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending_access = {}
+        self._pending_counts = {}
+        self._last_flush = time.time()
+        atexit.register(self.flush)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # One connection per thread; WAL lets readers and a writer work concurrently.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn, name, amount=1):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def _record(self, name, entry=None, now=None):
+        with self._lock:
+            self._pending_counts[name] = self._pending_counts.get(name, 0) + 1
+            if entry is not None:
+                self._pending_access[entry] = now
+            due = (
+                len(self._pending_access) + sum(self._pending_counts.values()) >= FLUSH_EVERY
+                or time.time() - self._last_flush >= FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def _take_pending(self):
+        with self._lock:
+            access, counts = self._pending_access, self._pending_counts
+            self._pending_access, self._pending_counts = {}, {}
+            self._last_flush = time.time()
+        return access, counts
+
+    def _write_pending(self, conn, access, counts):
+        if access:
+            conn.executemany(
+                "UPDATE entries SET accessed = MAX(accessed, ?) WHERE namespace = ? AND kind = ? AND key = ?",
+                [(when, *entry) for entry, when in access.items()],
+            )
+        for name, amount in counts.items():
+            self._bump(conn, name, amount)
+
+    def flush(self):
+        """Write buffered access times and counters in one transaction."""
+        access, counts = self._take_pending()
+        if not access and not counts:
+            return
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._write_pending(conn, access, counts)
+
+    def get(self, namespace, kind, key):
+        """Cached value, or None on a miss or an expired entry. Read-only for SQLite."""
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT value, expires FROM entries WHERE namespace = ? AND kind = ? AND key = ?",
+            (namespace, kind, key),
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            # Expired rows are removed by the next write's eviction pass.
+            self._record("misses")
+            return None
+        self._record("hits", (namespace, kind, key), now)
+        return decode(row[0])
+
+    def set(self, namespace, kind, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        blob, now = encode(value), time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, kind, key, value, size, created, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (namespace, kind, key, blob, len(blob), now, now + ttl if ttl else None, now),
+            )
+            self._bump(conn, "sets")
+            self._write_pending(conn, *self._take_pending())
+            self._evict(conn, now)
+
+    def get_or_set(self, namespace, kind, key, loader, ttl=None):
+        """Return the cached value or call ``loader``; falsy loader results are not cached."""
+        value = self.get(namespace, kind, key)
+        if value is None:
+            value = loader()
+            if value:
+                self.set(namespace, kind, key, value, ttl)
+        return value
+
+    def _evict(self, conn, now):
+        expired = conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?", (now,)).rowcount
+        if expired:
+            self._bump(conn, "expired", expired)
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        evicted = 0
+        if total > self.max_bytes:
+            for namespace, kind, key, size in conn.execute(
+                "SELECT namespace, kind, key, size FROM entries ORDER BY accessed"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND kind = ? AND key = ?",
+                    (namespace, kind, key),
+                )
+                total -= size
+                evicted += 1
+        if evicted:
+            self._bump(conn, "evictions", evicted)
+
+    def invalidate(self, namespace, kind=None, key=None):
+        query, params = "DELETE FROM entries WHERE namespace = ?", [namespace]
+        if kind is not None:
+            query, params = query + " AND kind = ?", params + [kind]
+        if key is not None:
+            query, params = query + " AND key = ?", params + [key]
+        with self._conn() as conn:
+            conn.execute(query, params)
+
+    def stats(self):
+        self.flush()
+        conn = self._conn()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        by_kind = dict(conn.execute("SELECT kind, COUNT(*) FROM entries GROUP BY kind").fetchall())
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "by_kind": by_kind,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "hit_rate": counters.get("hits", 0) / lookups if lookups else 0.0,
+            "sets": counters.get("sets", 0),
+            "evictions": counters.get("evictions", 0),
+            "expired": counters.get("expired", 0),
+        }
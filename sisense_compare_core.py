@@ -0,0 +1,273 @@
+# Filename: sisense_compare_core.py
+#
+# Fetching and extraction shared by the Streamlit comparator and the watch mode.
+
+import hashlib
+import json
+import re
+
+import requests
+
+DEFAULT_TIMEOUT = 60
+
+# Bump when extract_info's output changes so cached extractions are not reused.
+EXTRACTION_VERSION = 3
+
+SECTIONS = {
+    "filters": "Filters",
+    "filter_changes": "Filter Definitions",
+    "widgets": "Widget Titles",
+    "widget_types": "Widget Types",
+    "rich_text": "Rich Text",
+    "indicators": "Indicators",
+    "pivots": "Pivot Columns",
+}
+
+
+# ------------------------- Fetching -------------------------
+def auth_headers(token):
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def fetch_dashboard(base_url, dashboard_id, headers, timeout=DEFAULT_TIMEOUT):
+    try:
+        res = requests.get(f"{base_url}/api/v1/dashboards/{dashboard_id}", headers=headers, timeout=timeout)
+        return res.json() if res.ok else None
+    except:
+        return None
+
+
+def get_widgets(base_url, dashboard_id, headers, timeout=DEFAULT_TIMEOUT):
+    try:
+        res = requests.get(f"{base_url}/api/v1/dashboards/{dashboard_id}/widgets", headers=headers, timeout=timeout)
+        return res.json() if res.ok else []
+    except:
+        return []
+
+
+def list_dashboards(base_url, headers, fields=("oid", "lastUpdated"), timeout=DEFAULT_TIMEOUT):
+    """Lightweight dashboard listing: only the requested fields, no widgets."""
+    try:
+        res = requests.get(
+            f"{base_url}/api/v1/dashboards",
+            headers=headers,
+            params={"fields": ",".join(fields)},
+            timeout=timeout,
+        )
+        return res.json() if res.ok else None
+    except:
+        return None
+
+
+def load_dashboard(base_url, dashboard_id, headers, timeout=DEFAULT_TIMEOUT):
+    """Dashboard payload with its widgets attached, or None if it could not be fetched."""
+    dash = fetch_dashboard(base_url, dashboard_id, headers, timeout)
+    if not dash:
+        return None
+    dash["widgets"] = get_widgets(base_url, dashboard_id, headers, timeout) or []
+    return dash
+
+
+def payload_hash(dash):
+    """Stable hash of a dashboard payload, ignoring bookkeeping timestamps."""
+    volatile = {"lastUpdated", "lastOpened", "lastUsed"}
+    content = {k: v for k, v in (dash or {}).items() if k not in volatile}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# ------------------------- Extraction -------------------------
+def strip_html_tags(html):
+    return re.sub('<[^<]+?>', '', html or '').strip()
+
+
+def expand_formula(formula, context):
+    for key, val in context.items():
+        formula = formula.replace(key, val.get("title", key))
+    return formula
+
+
+# Keys in a JAQL filter that only drive the filter UI, not the result.
+FILTER_UI_KEYS = {"explicit", "multiSelection", "userMembers", "custom", "isCondition"}
+
+
+def member_fingerprint(members):
+    """Order-independent fingerprint of a member set, computed in one linear pass."""
+    unique = set(map(str, members))
+    acc = 0
+    for m in unique:
+        acc = (acc + int.from_bytes(hashlib.blake2b(m.encode("utf-8"), digest_size=8).digest(), "big")) % (1 << 64)
+    return f"{len(unique)}:{acc:016x}"
+
+
+def filter_summary(record):
+    spec = record["spec"]
+    if record["members"] is not None:
+        text = f"{'Exclude' if record['exclude'] else 'Include'} {len(record['members'])} member(s)"
+    elif spec.get("all"):
+        text = "All"
+    elif "from" in spec or "to" in spec:
+        text = f"{spec.get('from', '…')} → {spec.get('to', '…')}"
+    elif "last" in spec or "next" in spec:
+        period = "last" if "last" in spec else "next"
+        text = f"{period.title()} {spec[period].get('count', '')} {record['level'] or ''}".strip()
+    else:
+        text = json.dumps(spec, sort_keys=True, default=str)[:80]
+    return f"🚫 {text} (disabled)" if record["disabled"] else text
+
+
+def filter_record(jaql, disabled=False, cascade=None):
+    """Full semantics of one filter jaql: members, exclude flag, level, date range and the rest of the spec."""
+    spec = {k: v for k, v in (jaql.get("filter") or {}).items() if k not in FILTER_UI_KEYS}
+    exclude = isinstance(spec.get("exclude"), dict)
+    source = dict(spec.pop("exclude")) if exclude else spec
+    members = source.pop("members", None)
+    if exclude and source:
+        spec["exclude"] = source
+
+    dim, level = jaql.get("dim", ""), jaql.get("level", "")
+    title = jaql.get("title", "") or dim
+    # The same title can filter different dims or date levels (Date by years and by months).
+    key = [title.strip().lower(), dim.lower(), level.lower()]
+    title = f"{title} ({level})" if level else title
+    record = {
+        "key": "|".join(key + ([cascade[1].lower(), str(cascade[0])] if cascade else [])),
+        "title": f"{cascade[1]} › {title}" if cascade else title,
+        "dim": dim,
+        "level": level,
+        "cascade_level": cascade[0] if cascade else None,
+        "exclude": exclude,
+        "disabled": bool(disabled),
+        "members": list(dict.fromkeys(map(str, members))) if members is not None else None,
+        "spec": spec,
+    }
+    record["definition"] = json.dumps(
+        {k: record[k] for k in ("dim", "level", "exclude", "disabled", "spec")}, sort_keys=True, default=str
+    )
+    record["member_fingerprint"] = member_fingerprint(record["members"]) if members is not None else ""
+    record["fingerprint"] = hashlib.sha1(
+        (record["definition"] + record["member_fingerprint"]).encode("utf-8")
+    ).hexdigest()
+    record["summary"] = filter_summary(record)
+    return record
+
+
+def extract_filters(dash_filters):
+    """One record per filter; cascading filters contribute one record per level."""
+    records = []
+    for f in dash_filters or []:
+        levels = f.get("levels")
+        if levels:
+            group = " / ".join(l.get("title", "") or l.get("dim", "") for l in levels)
+            for depth, jaql in enumerate(levels, start=1):
+                records.append(filter_record(jaql, f.get("disabled"), cascade=(depth, group)))
+        else:
+            records.append(filter_record(f.get("jaql", {}), f.get("disabled")))
+    return records
+
+
+def extract_info(dash):
+    filters = extract_filters(dash.get("filters", []))
+    widgets = dash.get("widgets", []) or []
+    if isinstance(widgets, dict):
+        widgets = widgets.get("widgets", [])
+
+    widget_info, rich_texts, indicators, pivots = [], [], set(), []
+
+    for w in widgets:
+        widget_info.append({"title": w.get("title", ""), "type": w.get("type", "")})
+        html = w.get("style", {}).get("content", {}).get("html", "")
+        if html:
+            rich_texts.append(strip_html_tags(html))
+
+        if w.get("type", "").lower() == "indicator":
+            for panel in w.get("metadata", {}).get("panels", []):
+                for item in panel.get("items", []):
+                    jaql = item.get("jaql", {})
+                    title = jaql.get("title", "")
+                    context = jaql.get("context", {})
+                    for ctx in context.values():
+                        panel_name = panel.get("name", "")
+                        source = ctx.get("title", "")
+                        dedup_key = (
+                            panel_name.strip().lower(),
+                            title.strip().lower(),
+                            source.strip().lower()
+                        )
+                        if dedup_key not in indicators:
+                            indicators.add(dedup_key)
+
+        if w.get("type", "").lower() == "pivot2":
+            for panel in w.get("metadata", {}).get("panels", []):
+                for item in panel.get("items", []):
+                    jaql = item.get("jaql", {})
+                    if panel.get("name", "").lower() == "values" and "formula" in jaql:
+                        formula = expand_formula(jaql["formula"], jaql.get("context", {}))
+                        pivots.append((panel.get("name"), jaql.get("title", ""), formula))
+                    else:
+                        pivots.append((panel.get("name"), jaql.get("title", ""), f"{jaql.get('table', '')}.{jaql.get('column', '')}"))
+
+    indicators_list = [
+        {"panel": k[0], "title": k[1], "source": k[2]}
+        for k in sorted(indicators)
+    ]
+
+    return {
+        "title": dash.get("title", "Untitled"),
+        "filters": filters,
+        "widgets": widget_info,
+        "rich_text": rich_texts,
+        "indicators": [(i["panel"], i["title"], i["source"]) for i in indicators_list],
+        "pivots": pivots
+    }
+
+
+# ------------------------- Comparison -------------------------
+def comparable_items(info):
+    """Per-section sets of the items the comparison tables are built from."""
+    return {
+        "filters": {f["title"] for f in info.get("filters", [])},
+        "widgets": {w.get("title", "") for w in info.get("widgets", [])},
+        "widget_types": {w.get("type", "") for w in info.get("widgets", [])},
+        "rich_text": set(info.get("rich_text", [])),
+        "indicators": set(map(tuple, info.get("indicators", []))),
+        "pivots": set(map(tuple, info.get("pivots", []))),
+    }
+
+
+def diff_filters(filters_a, filters_b):
+    """Changes to filters present on both sides.
+
+    Fingerprints are compared first; only filters whose fingerprints differ get a
+    definition comparison and a set difference of their members.
+    """
+    by_key_b = {f["key"]: f for f in filters_b}
+    changes = []
+    for fa in filters_a:
+        fb = by_key_b.get(fa["key"])
+        if fb is None or fa["fingerprint"] == fb["fingerprint"]:
+            continue
+        change = {"filter": fa["title"], "definition_a": "", "definition_b": "", "removed": [], "added": []}
+        if fa["definition"] != fb["definition"]:
+            change["definition_a"], change["definition_b"] = fa["summary"], fb["summary"]
+        if fa["member_fingerprint"] != fb["member_fingerprint"]:
+            members_a, members_b = fa["members"] or [], fb["members"] or []
+            set_a, set_b = set(members_a), set(members_b)
+            change["removed"] = [m for m in members_a if m not in set_b]
+            change["added"] = [m for m in members_b if m not in set_a]
+        changes.append(change)
+    return changes
+
+
+def diff_info(info_a, info_b):
+    """Sections that differ between two extracted dashboards, with items unique to each side."""
+    items_a, items_b = comparable_items(info_a), comparable_items(info_b)
+    diff = {}
+    filter_changes = diff_filters(info_a.get("filters", []), info_b.get("filters", []))
+    if filter_changes:
+        diff["filter_changes"] = filter_changes
+    for section in items_a:
+        only_a = sorted(items_a[section] - items_b[section])
+        only_b = sorted(items_b[section] - items_a[section])
+        if only_a or only_b:
+            diff[section] = {"only_in_a": only_a, "only_in_b": only_b}
+    return diff
@@ -3,11 +3,29 @@
 import streamlit as st
 import requests
 import json
-import re
 import pandas as pd
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from snowflake.snowpark import Session
 
+from sisense_cache import SqliteCache, cache_namespace
+from sisense_compare_core import (
+    EXTRACTION_VERSION,
+    auth_headers,
+    diff_filters,
+    extract_info,
+    list_dashboards,
+    load_dashboard,
+    payload_hash,
+)
+from sisense_jaql_compare import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_ROW_LIMIT,
+    DEFAULT_SAMPLE_ROWS,
+    compare_data,
+)
+from sisense_matcher import build_index, fingerprint
+
 st.set_page_config(layout="wide")
 st.title("📊 Multi-Environment Sisense Dashboard Comparator")
 
@@ -89,6 +107,20 @@ else:
 
 # ------------------ Main Comparator App (Visible After Login) ------------------ #
 
+@st.cache_resource
+def get_shared_cache():
+    """Process-wide handle on the shared SQLite cache (also used by other sessions and replicas)."""
+    return SqliteCache()
+
+shared_cache = get_shared_cache()
+
+with st.sidebar.expander("🗄️ Shared Cache"):
+    cache_stats = shared_cache.stats()
+    st.write(f"Entries: {cache_stats['entries']} ({cache_stats['bytes'] / 1024 / 1024:.1f} of {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB)")
+    st.write(f"Hit rate: {cache_stats['hit_rate']:.0%} ({cache_stats['hits']} hits / {cache_stats['misses']} misses)")
+    st.write(f"Evictions: {cache_stats['evictions']}, expired: {cache_stats['expired']}")
+    st.json(cache_stats["by_kind"], expanded=False)
+
 # ------------------------- Step 1: Environment Setup -------------------------
 num_envs = st.number_input("🌍 How many environments would you like to compare?", 1, 5, 2)
 
@@ -126,84 +158,66 @@ if st.session_state.env_info:
             env_selected = st.selectbox(f"Select Environment", options=list(st.session_state.env_info.keys()), key=f"env_sel_{i}")
         dash_inputs.append((dash_id, env_selected))
 
-    # ------------------------- Helper Functions -------------------------
-    def fetch_dashboard(base_url, dashboard_id, headers):
-        try:
-            res = requests.get(f"{base_url}/api/v1/dashboards/{dashboard_id}", headers=headers)
-            return res.json() if res.ok else None
-        except:
-            return None
-
-    def get_widgets(base_url, dashboard_id, headers):
-        try:
-            res = requests.get(f"{base_url}/api/v1/dashboards/{dashboard_id}/widgets", headers=headers)
-            return res.json() if res.ok else []
-        except:
-            return []
-
-    def strip_html_tags(html):
-        return re.sub('<[^<]+?>', '', html or '').strip()
-
-    def expand_formula(formula, context):
-        for key, val in context.items():
-            formula = formula.replace(key, val.get("title", key))
-        return formula
-
-    def extract_info(dash):
-        filters = [f.get("jaql", {}).get("title", "") for f in dash.get("filters", [])]
-        widgets = dash.get("widgets", []) or []
-        if isinstance(widgets, dict):
-            widgets = widgets.get("widgets", [])
-
-        widget_info, rich_texts, indicators, pivots = [], [], set(), []
-
-        for w in widgets:
-            widget_info.append({"title": w.get("title", ""), "type": w.get("type", "")})
-            html = w.get("style", {}).get("content", {}).get("html", "")
-            if html:
-                rich_texts.append(strip_html_tags(html))
-
-            if w.get("type", "").lower() == "indicator":
-                for panel in w.get("metadata", {}).get("panels", []):
-                    for item in panel.get("items", []):
-                        jaql = item.get("jaql", {})
-                        title = jaql.get("title", "")
-                        context = jaql.get("context", {})
-                        for ctx in context.values():
-                            panel_name = panel.get("name", "")
-                            source = ctx.get("title", "")
-                            dedup_key = (
-                                panel_name.strip().lower(),
-                                title.strip().lower(),
-                                source.strip().lower()
-                            )
-                            if dedup_key not in indicators:
-                                indicators.add(dedup_key)
-
-            if w.get("type", "").lower() == "pivot2":
-                for panel in w.get("metadata", {}).get("panels", []):
-                    for item in panel.get("items", []):
-                        jaql = item.get("jaql", {})
-                        if panel.get("name", "").lower() == "values" and "formula" in jaql:
-                            formula = expand_formula(jaql["formula"], jaql.get("context", {}))
-                            pivots.append((panel.get("name"), jaql.get("title", ""), formula))
-                        else:
-                            pivots.append((panel.get("name"), jaql.get("title", ""), f"{jaql.get('table', '')}.{jaql.get('column', '')}"))
-
-        indicators_list = [
-            {"panel": k[0], "title": k[1], "source": k[2]}
-            for k in sorted(indicators)
-        ]
-
-        return {
-            "title": dash.get("title", "Untitled"),
-            "filters": filters,
-            "widgets": widget_info,
-            "rich_text": rich_texts,
-            "indicators": [(i["panel"], i["title"], i["source"]) for i in indicators_list],
-            "pivots": pivots
-        }
+    def env_index(env_key):
+        env = st.session_state.env_info[env_key]
+        indexes = st.session_state.setdefault("match_indexes", {})
+        if (env["url"], env["token"]) not in indexes:
+            with st.spinner(f"Fingerprinting dashboards in {env_key}..."):
+                indexes[(env["url"], env["token"])] = build_index(
+                    env["url"], auth_headers(env["token"]),
+                    cache=shared_cache, namespace=cache_namespace(env["url"], env["token"]),
+                )
+        return indexes[(env["url"], env["token"])]
+
+    def prefill_matches():
+        """Fill Dashboard ID 2..N with the best fingerprint matches for Dashboard ID 1."""
+        ref_id, ref_env_key = st.session_state.get("dash_id_0", ""), st.session_state.get("env_sel_0")
+        ref_env = st.session_state.env_info.get(ref_env_key)
+        ref_dash = load_dashboard(ref_env["url"], ref_id, auth_headers(ref_env["token"])) if ref_id and ref_env else None
+        if not ref_dash:
+            st.session_state.match_results = {"error": f"Could not load reference dashboard '{ref_id}'"}
+            return
+
+        ref_fp = fingerprint(ref_dash)
+        used = {ref_env_key: {ref_id}}
+        rows = []
+        for i in range(1, num_dash):
+            env_key = st.session_state.get(f"env_sel_{i}")
+            index = env_index(env_key)
+            matches = index.query(ref_fp, top=3, exclude=used.setdefault(env_key, set())) if index else []
+            if matches:
+                st.session_state[f"dash_id_{i}"] = matches[0][0]
+                used[env_key].add(matches[0][0])
+            rows.append({
+                "Dashboard": f"Dashboard ID {i + 1}",
+                "Environment": env_key,
+                "Match ID": matches[0][0] if matches else "",
+                "Match Title": matches[0][1] if matches else ("❌ Index failed" if index is None else "No match"),
+                "Score": round(matches[0][2], 3) if matches else None,
+                "Other Candidates": ", ".join(f"{t} ({s:.2f})" for _, t, s in matches[1:]),
+            })
+        st.session_state.match_results = {"rows": rows}
+
+    st.button("🧭 Find Matches for Dashboard ID 1", on_click=prefill_matches)
+    match_results = st.session_state.get("match_results")
+    if match_results:
+        if "error" in match_results:
+            st.error(f"❌ {match_results['error']}")
+        else:
+            st.dataframe(pd.DataFrame(match_results["rows"]), use_container_width=True)
+
+    bypass_cache = st.checkbox("♻️ Refetch dashboards (bypass shared cache)", key="bypass_cache")
+    run_data_compare = st.checkbox("🧪 Data-level comparison (runs each widget's JAQL)", key="run_data_compare")
+    if run_data_compare:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            row_limit = st.number_input("Row limit per query", 1, 100000, DEFAULT_ROW_LIMIT, key="jaql_row_limit")
+        with col2:
+            sample_rows = st.number_input("Sample rows (hash pass)", 1, 100000, DEFAULT_SAMPLE_ROWS, key="jaql_sample_rows")
+        with col3:
+            max_workers = st.number_input("Parallel queries", 1, 16, DEFAULT_MAX_WORKERS, key="jaql_max_workers")
 
+    # ------------------------- Helper Functions -------------------------
     def compare_list(a, b, label, name1, name2):
         union = sorted(set(a + b))
         return pd.DataFrame({
@@ -250,51 +264,199 @@ if st.session_state.env_info:
             data[title_map[dash_id]] = ["✅" if r in values_set else "" for r in all_rows]
         return pd.DataFrame(data)
 
-    # ------------------------- Comparison -------------------------
-    if st.button("🔍 Compare Dashboards"):
-        dashboards_info = {}
-        for dash_id, env_key in dash_inputs:
-            env = st.session_state.env_info[env_key]
-            headers = {"Authorization": f"Bearer {env['token']}"}
-            dash = fetch_dashboard(env["url"], dash_id, headers)
-            widgets = get_widgets(env["url"], dash_id, headers)
-            if dash:
-                dash["widgets"] = widgets or []
-                info = extract_info(dash)
-                dashboards_info[dash_id] = {"title": info["title"], "data": info}
-            else:
-                st.error(f"❌ Failed to load dashboard {dash_id}")
-                st.stop()
-
-        dash_ids = list(dashboards_info.keys())
-        title_map = {dash_id: dashboards_info[dash_id]["title"] for dash_id in dash_ids}
-
-        st.markdown("### 🎯 Filters")
-        st.dataframe(consolidated_table("filters", "Filter"), use_container_width=True)
-
-        st.markdown("### 🧩 Widget Titles")
-        st.dataframe(consolidated_table("widgets", "Widget Title"), use_container_width=True)
-
-        st.markdown("### ⚙️ Widget Types")
+    def filter_table():
+        rows, fingerprints = {}, {}
+        for dash_id in dash_ids:
+            for f in dashboards_info[dash_id]["data"].get("filters", []):
+                rows.setdefault(f["key"], {"Filter": f["title"]})[title_map[dash_id]] = f["summary"]
+                fingerprints.setdefault(f["key"], set()).add(f["fingerprint"])
+        for key, row in rows.items():
+            present = sum(1 for dash_id in dash_ids if title_map[dash_id] in row)
+            row["Identical"] = "✅" if present == len(dash_ids) and len(fingerprints[key]) == 1 else "❌"
+        columns = ["Filter"] + [title_map[d] for d in dash_ids] + ["Identical"]
+        return pd.DataFrame(list(rows.values()), columns=columns).fillna("")
+
+    def filter_diff_table():
+        baseline = dash_ids[0]
+        records = []
+        for dash_id in dash_ids[1:]:
+            changes = diff_filters(
+                dashboards_info[baseline]["data"].get("filters", []),
+                dashboards_info[dash_id]["data"].get("filters", []),
+            )
+            for c in changes:
+                records.append({
+                    "Filter": c["filter"],
+                    "Compared With": title_map[dash_id],
+                    title_map[baseline]: c["definition_a"],
+                    "Other Definition": c["definition_b"],
+                    "Removed Members": f"({len(c['removed'])}) " + ", ".join(c["removed"]) if c["removed"] else "",
+                    "Added Members": f"({len(c['added'])}) " + ", ".join(c["added"]) if c["added"] else "",
+                })
+        columns = ["Filter", "Compared With", title_map[baseline], "Other Definition", "Removed Members", "Added Members"]
+        return pd.DataFrame(records, columns=columns)
+
+    def widget_type_table():
         widget_types = {
-            k: [w.get("type", "") for w in v["data"].get("widgets", [])]
-            for k, v in dashboards_info.items()
+            k: [w.get("type", "") for w in dashboards_info[k]["data"].get("widgets", [])]
+            for k in dash_ids
         }
         all_types = sorted(set(sum(widget_types.values(), [])))
-        df_widget_type = pd.DataFrame({
+        return pd.DataFrame({
             "Widget Type": all_types,
             **{title_map[k]: ["✅" if t in v else "" for t in all_types] for k, v in widget_types.items()}
         })
-        st.dataframe(df_widget_type, use_container_width=True)
 
-        st.markdown("### 📝 Rich Text (Cleaned)")
-        st.dataframe(consolidated_table("rich_text", "Rich Text"), use_container_width=True)
-
-        st.markdown("### 📌 Indicators")
-        st.dataframe(consolidated_triples("indicators", ["Panel", "Title", "Source"]), use_container_width=True)
+    def display_titles(ids, status):
+        """Unique column labels for ``(dash_id, env_key)`` keys: QA and prod copies usually share a title."""
+        labels = {k: f"{dashboards_info[k]['title']} ({status[k]['Environment']})" for k in ids}
+        counts = pd.Series(list(labels.values())).value_counts()
+        return {k: f"{label} [{k[0]}]" if counts[label] > 1 else label for k, label in labels.items()}
+
+    def listing_stamps(env):
+        """``{oid: lastUpdated}`` for the dashboards this user's token can see."""
+        listing = list_dashboards(env["url"], auth_headers(env["token"])) or []
+        return {d.get("oid"): d.get("lastUpdated") for d in listing}
+
+    def load_and_extract(dash_id, env, stamps, refresh=False):
+        """Load a dashboard through the shared cache.
+
+        Payloads are cached per token, keyed by oid and lastUpdated from this
+        user's own listing (``stamps``). Extractions are keyed by payload hash,
+        so they are shared by every user of the environment.
+        """
+        headers = auth_headers(env["token"])
+        namespace = cache_namespace(env["url"], env["token"])
+        stamp = stamps.result().get(dash_id)
+        loader = lambda: load_dashboard(env["url"], dash_id, headers)
+        if stamp is None:
+            # Not in this user's listing (or no timestamp): never serve or store it shared.
+            dash = loader()
+        elif refresh:
+            dash = loader()
+            if dash:
+                shared_cache.set(namespace, "dashboard", f"{dash_id}:{stamp}", dash)
+        else:
+            dash = shared_cache.get_or_set(namespace, "dashboard", f"{dash_id}:{stamp}", loader)
+        if not dash:
+            return None
+        info = shared_cache.get_or_set(
+            cache_namespace(env["url"]), "info", f"v{EXTRACTION_VERSION}:{payload_hash(dash)}", lambda: extract_info(dash)
+        )
+        return dash, headers, info
 
-        st.markdown("### 🧠 Pivot Columns")
-        st.dataframe(consolidated_triples("pivots", ["Panel", "Title", "Formula/Column"]), use_container_width=True)
+    # ------------------------- Comparison -------------------------
+    if st.button("🔍 Compare Dashboards"):
+        dashboards_info = {}
+        dash_ids, title_map = [], {}
+
+        st.markdown("### 📡 Load Status")
+        status_slot = st.empty()
+        # Keyed by (dash_id, env_key): the same oid may be entered for two environments.
+        status = {
+            (dash_id, env_key): {"Dashboard ID": dash_id, "Environment": env_key, "Title": "", "Status": "⏳ Loading"}
+            for dash_id, env_key in dash_inputs
+        }
+        status_slot.dataframe(pd.DataFrame(status.values()), use_container_width=True)
+
+        sections = [
+            ("### 🎯 Filters", filter_table),
+            ("### 🔍 Filter Differences (vs. first dashboard)", filter_diff_table),
+            ("### 🧩 Widget Titles", lambda: consolidated_table("widgets", "Widget Title")),
+            ("### ⚙️ Widget Types", widget_type_table),
+            ("### 📝 Rich Text (Cleaned)", lambda: consolidated_table("rich_text", "Rich Text")),
+            ("### 📌 Indicators", lambda: consolidated_triples("indicators", ["Panel", "Title", "Source"])),
+            ("### 🧠 Pivot Columns", lambda: consolidated_triples("pivots", ["Panel", "Title", "Formula/Column"])),
+        ]
+        section_slots = []
+        for header, _ in sections:
+            st.markdown(header)
+            slot = st.empty()
+            slot.info("⏳ Waiting for dashboards...")
+            section_slots.append(slot)
+
+        # Fetch in worker threads; all Streamlit calls stay on the script thread.
+        # Listings run in their own pool so a slow environment only delays its own dashboards.
+        env_keys = {env_key for _, env_key in dash_inputs}
+        with ThreadPoolExecutor(max_workers=len(env_keys)) as list_pool, ThreadPoolExecutor(max_workers=len(status)) as pool:
+            listings = {
+                env_key: list_pool.submit(listing_stamps, st.session_state.env_info[env_key]) for env_key in env_keys
+            }
+            futures = {
+                pool.submit(
+                    load_and_extract, dash_id, st.session_state.env_info[env_key], listings[env_key], bypass_cache
+                ): (dash_id, env_key)
+                for dash_id, env_key in status if dash_id
+            }
+            for (dash_id, _), row in status.items():
+                if not dash_id:
+                    row["Status"] = "⚠️ No ID"
+            for future in as_completed(futures):
+                key = futures[future]
+                env_key = key[1]
+                try:
+                    loaded = future.result()
+                except Exception:
+                    loaded = None
+                if loaded is None:
+                    status[key]["Status"] = "❌ Failed"
+                else:
+                    dash, headers, info = loaded
+                    env = st.session_state.env_info[env_key]
+                    dashboards_info[key] = {"title": info["title"], "data": info, "dash": dash, "env": env, "headers": headers}
+                    status[key]["Title"] = info["title"]
+                    status[key]["Status"] = "✅ Loaded"
+                status_slot.dataframe(pd.DataFrame(status.values()), use_container_width=True)
+
+                if dashboards_info:
+                    dash_ids = [d for d in status if d in dashboards_info]
+                    title_map = display_titles(dash_ids, status)
+                    for slot, (_, build) in zip(section_slots, sections):
+                        slot.dataframe(build(), use_container_width=True)
+
+        failed = [f"{d or '(blank)'} ({env_key})" for (d, env_key), row in status.items() if row["Status"] != "✅ Loaded"]
+        if failed:
+            st.warning(f"⚠️ Showing partial results; could not load: {', '.join(failed)}")
+        if not dashboards_info:
+            for slot in section_slots:
+                slot.error("❌ No dashboards could be loaded.")
+
+        if run_data_compare and len(dash_ids) >= 2:
+            st.markdown("### 🧪 Data Comparison")
+            data_labels = [title_map[dash_id] for dash_id in dash_ids]
+            with st.spinner("Running widget queries..."):
+                data_result = compare_data(
+                    [
+                        {
+                            "url": dashboards_info[dash_id]["env"]["url"],
+                            "headers": dashboards_info[dash_id]["headers"],
+                            "dash": dashboards_info[dash_id]["dash"],
+                        }
+                        for dash_id in dash_ids
+                    ],
+                    row_limit=int(row_limit),
+                    sample_rows=int(sample_rows),
+                    max_workers=int(max_workers),
+                )
+            if data_result["columns"]:
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Widget": row["widget"],
+                        "Column": row["column"],
+                        **dict(zip(data_labels, row["status"])),
+                        f"Cut at {int(row_limit)} rows": ", ".join(data_labels[i] for i in row["truncated"]),
+                    }
+                    for row in data_result["columns"]
+                ]), use_container_width=True)
+            else:
+                st.info("ℹ️ No widget queries to compare.")
+            for diff in data_result["row_diffs"]:
+                other_label = data_labels[diff["other"]]
+                with st.expander(f"❌ {diff['widget']} ({data_labels[0]} vs. {other_label})"):
+                    st.markdown(f"**Rows only in {data_labels[0]}**")
+                    st.dataframe(pd.DataFrame(diff["only_in_a"], columns=diff["headers_a"]), use_container_width=True)
+                    st.markdown(f"**Rows only in {other_label}**")
+                    st.dataframe(pd.DataFrame(diff["only_in_b"], columns=diff["headers_b"]), use_container_width=True)
 
 else:
     st.info("ℹ️ Please connect at least one environment to continue.")
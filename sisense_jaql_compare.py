@@ -0,0 +1,269 @@
+# Filename: sisense_jaql_compare.py
+#
+# Data-level comparison: rebuilds each widget's JAQL from its metadata panels,
+# runs it against the datasource JAQL endpoint of every environment and
+# compares the returned numbers.
+
+import hashlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+
+DEFAULT_ROW_LIMIT = 5000
+DEFAULT_SAMPLE_ROWS = 500
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 60
+
+
+# ------------------------- Query Building -------------------------
+def dashboard_filter_jaqls(dash_filters, ignore=None):
+    """Flatten dashboard filters (including cascading levels) into JAQL dicts.
+
+    ``ignore`` is the widget's ``metadata.ignore``: ``all``, or the ``dimensions``
+    and filter instance ``ids`` the widget does not take from the dashboard.
+    """
+    ignore = ignore or {}
+    if ignore.get("all"):
+        return []
+    ignored_dims = {d.lower() for d in ignore.get("dimensions", []) or []}
+    ignored_ids = set(ignore.get("ids", []) or [])
+
+    jaqls = []
+    for f in dash_filters or []:
+        if f.get("disabled") or f.get("instanceid") in ignored_ids:
+            continue
+        levels = f["levels"] if f.get("levels") else [f.get("jaql") or {}]
+        jaqls.extend(
+            level for level in levels
+            if level.get("filter") and level.get("dim", "").lower() not in ignored_dims
+        )
+    return jaqls
+
+
+def _sorted_jaql(jaql):
+    # Sort on dimensions (not measures) so every environment returns the same first N rows.
+    jaql = {k: v for k, v in jaql.items() if k != "sort"}
+    if not jaql.get("agg") and not jaql.get("formula"):
+        jaql["sort"] = "asc"
+    return jaql
+
+
+def build_widget_jaql(widget, dash_filters=None, datasource=None, count=None, offset=0):
+    """Reconstruct the JAQL query for a widget, or None if it has no data panels."""
+    datasource = widget.get("datasource") or datasource
+    if not datasource:
+        return None
+
+    metadata = []
+    widget_metadata = widget.get("metadata", {})
+    for panel in widget_metadata.get("panels", []):
+        panel_name = panel.get("name", "").lower()
+        for item in panel.get("items", []):
+            if item.get("disabled") or "jaql" not in item:
+                continue
+            if panel_name == "filters":
+                metadata.append({"jaql": item["jaql"], "panel": "scope"})
+            else:
+                metadata.append({"jaql": _sorted_jaql(item["jaql"])})
+
+    if not any(m.get("panel") != "scope" for m in metadata):
+        return None
+
+    for jaql in dashboard_filter_jaqls(dash_filters, widget_metadata.get("ignore")):
+        metadata.append({"jaql": jaql, "panel": "scope"})
+
+    query = {"datasource": datasource, "metadata": metadata, "offset": offset}
+    if count:
+        query["count"] = count
+    return query
+
+
+def widget_key(widget, seen):
+    """Key used to line widgets up across dashboards: type, title and occurrence."""
+    base = (widget.get("type", "").lower(), widget.get("title", "").strip().lower())
+    seen[base] += 1
+    return base + (seen[base],)
+
+
+# ------------------------- Query Execution -------------------------
+def run_jaql(base_url, headers, query, timeout=DEFAULT_TIMEOUT):
+    ds = query["datasource"]
+    ds_title = ds.get("title", "") if isinstance(ds, dict) else ds
+    try:
+        res = requests.post(
+            f"{base_url.rstrip('/')}/api/datasources/{quote(ds_title, safe='')}/jaql",
+            headers=headers,
+            json=query,
+            timeout=timeout,
+        )
+        return res.json() if res.ok else None
+    except Exception:
+        return None
+
+
+def run_queries(jobs, max_workers=DEFAULT_MAX_WORKERS):
+    """Run ``{key: (base_url, headers, query)}`` in parallel, at most ``max_workers`` at a time."""
+    if not jobs:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {key: pool.submit(run_jaql, *job) for key, job in jobs.items()}
+        return {key: fut.result() for key, fut in futures.items()}
+
+
+# ------------------------- Result Comparison -------------------------
+def _cell_value(cell):
+    value = cell.get("data") if isinstance(cell, dict) else cell
+    if isinstance(value, float):
+        value = round(value, 6)
+    return "" if value is None else str(value)
+
+
+def result_rows(result):
+    values = (result or {}).get("values", []) or []
+    if values and not isinstance(values[0], list):
+        values = [values]
+    return [tuple(_cell_value(c) for c in row) for row in values]
+
+
+def result_headers(result, width):
+    headers = list((result or {}).get("headers", []) or [])[:width]
+    return headers + [f"Column {i + 1}" for i in range(len(headers), width)]
+
+
+def result_table(result):
+    """Headers and rows of one result, with every row padded to the same width."""
+    rows = result_rows(result)
+    width = max([len((result or {}).get("headers", []) or [])] + [len(r) for r in rows])
+    return result_headers(result, width), [r + ("",) * (width - len(r)) for r in rows]
+
+
+def column_hashes(result):
+    """Hash per column, keyed by column header.
+
+    Values are hashed in row order, so a value that moved to another row changes
+    the hash; queries are sorted on their dimensions, so row order is stable.
+    """
+    headers, rows = result_table(result)
+    hashes = {}
+    for i, header in enumerate(headers):
+        hashes[header] = hashlib.sha1("\x1f".join(r[i] for r in rows).encode("utf-8")).hexdigest()
+    return hashes
+
+
+def diff_rows(result_a, result_b):
+    """Rows present in one result but not the other (multiset difference).
+
+    Each side keeps its own headers, since the two results may differ in width.
+    """
+    headers_a, rows_a = result_table(result_a)
+    headers_b, rows_b = result_table(result_b)
+    counts_a, counts_b = Counter(rows_a), Counter(rows_b)
+    return {
+        "headers_a": headers_a,
+        "headers_b": headers_b,
+        "only_in_a": sorted((counts_a - counts_b).elements()),
+        "only_in_b": sorted((counts_b - counts_a).elements()),
+    }
+
+
+def _values(result):
+    values = (result or {}).get("values", []) or []
+    return [values] if values and not isinstance(values[0], list) else list(values)
+
+
+def merge_results(first, rest):
+    """Append the rows of a follow-up page to the first page; None if either failed."""
+    if not first or not rest:
+        return None
+    merged = dict(first)
+    merged["values"] = _values(first) + _values(rest)
+    return merged
+
+
+def compare_data(dashboards, row_limit=DEFAULT_ROW_LIMIT, sample_rows=DEFAULT_SAMPLE_ROWS,
+                 max_workers=DEFAULT_MAX_WORKERS):
+    """Compare widget data of every dashboard against the first one.
+
+    ``dashboards`` is a list of dicts with ``url``, ``headers`` and the raw
+    dashboard payload under ``dash`` (widgets already attached). Results are
+    positional: ``status`` and ``truncated`` are indexed like ``dashboards``, so
+    dashboards that share a title stay separate.
+
+    Queries are sorted on their dimensions. The first pass fetches up to
+    ``sample_rows`` rows, which settles widgets that fit in the sample on every
+    side. Where a side filled its sample, only the remaining rows up to
+    ``row_limit`` are fetched with an offset and appended, so no row is fetched
+    twice. Results cut off at ``row_limit`` are flagged in ``truncated``.
+    """
+    if len(dashboards) < 2:
+        return {"columns": [], "row_diffs": []}
+
+    sample_rows = min(sample_rows or row_limit, row_limit)
+    widget_maps, labels = [], {}
+    for d in dashboards:
+        dash = d["dash"]
+        widgets = dash.get("widgets", []) or []
+        if isinstance(widgets, dict):
+            widgets = widgets.get("widgets", [])
+        seen, mapping = Counter(), {}
+        for w in widgets:
+            key = widget_key(w, seen)
+            mapping[key] = w
+            label = w.get("title", "") or w.get("type", "")
+            labels.setdefault(key, f"{label} #{key[2]}" if key[2] > 1 else label)
+        widget_maps.append(mapping)
+
+    def jobs_for(targets, count, offset=0):
+        jobs = {}
+        for idx, key in targets:
+            d, w = dashboards[idx], widget_maps[idx].get(key)
+            if w is None:
+                continue
+            query = build_widget_jaql(w, d["dash"].get("filters"), d["dash"].get("datasource"), count=count, offset=offset)
+            if query:
+                jobs[(idx, key)] = (d["url"], d["headers"], query)
+        return jobs
+
+    keys = list(widget_maps[0])
+    results = run_queries(jobs_for([(idx, key) for idx in range(len(dashboards)) for key in keys], sample_rows), max_workers)
+    keys = [key for key in keys if (0, key) in results]
+    counts = {target: len(_values(r)) for target, r in results.items()}
+
+    full_samples = [target for target, n in counts.items() if n >= sample_rows]
+    if sample_rows < row_limit and full_samples:
+        rest = run_queries(jobs_for(full_samples, row_limit - sample_rows, offset=sample_rows), max_workers)
+        for target in full_samples:
+            results[target] = merge_results(results[target], rest.get(target))
+            counts[target] = len(_values(results[target]))
+
+    hashes = {target: column_hashes(r) if r else {} for target, r in results.items()}
+
+    columns, row_diffs = [], []
+    for key in keys:
+        base_hashes = hashes[(0, key)]
+        per_dash = [base_hashes] + [hashes.get((idx, key)) for idx in range(1, len(dashboards))]
+        truncated = [idx for idx in range(len(dashboards)) if counts.get((idx, key), 0) >= row_limit]
+
+        all_columns = sorted(set().union(*(h for h in per_dash if h))) or ["(query failed)"]
+        for column in all_columns:
+            status = ["✅" if column in base_hashes else "❌"]
+            for other in per_dash[1:]:
+                if other is None:
+                    status.append("—")
+                elif column in other and column in base_hashes and other[column] == base_hashes[column]:
+                    status.append("✅")
+                else:
+                    status.append("❌")
+            columns.append({"widget": labels[key], "column": column, "status": status, "truncated": truncated})
+
+        base = results[(0, key)]
+        for idx in range(1, len(dashboards)):
+            if (idx, key) not in results:
+                continue
+            other = results[(idx, key)]
+            if not base or not other or hashes[(idx, key)] != base_hashes:
+                row_diffs.append({"widget": labels[key], "other": idx, **diff_rows(base, other)})
+
+    return {"columns": columns, "row_diffs": row_diffs}
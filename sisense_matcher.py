@@ -0,0 +1,140 @@
+# Filename: sisense_matcher.py
+#
+# Finds the counterpart of a dashboard in another environment when oids changed
+# on export/import, using compact content fingerprints and an inverted index.
+
+import hashlib
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from sisense_compare_core import extract_filters, list_dashboards, load_dashboard
+
+DEFAULT_MAX_WORKERS = 8
+
+# Import/copy markers Sisense or users append to dashboards: "(2)", "copy",
+# "_qa", "- prod". Plain trailing numbers such as years are part of the title.
+TITLE_SUFFIX = re.compile(r"\s*(\(\d+\)|[-_ ]*copy( \d+)?|\s*[-_]\s*(qa|uat|prod|dev))$", re.I)
+
+
+# ------------------------- Fingerprints -------------------------
+def normalize_title(title):
+    title = (title or "").strip().lower()
+    while True:
+        stripped = TITLE_SUFFIX.sub("", title).strip()
+        if stripped == title or not stripped:
+            return title
+        title = stripped
+
+
+def _token(feature):
+    return hashlib.blake2b(feature.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def _formula_key(jaql):
+    # Context keys are generated per widget, so substitute the referenced dims.
+    formula = jaql.get("formula", "")
+    for key, val in (jaql.get("context") or {}).items():
+        formula = formula.replace(key, val.get("dim", "") or val.get("formula", "") or val.get("title", key))
+    return re.sub(r"\s+", "", formula).lower()
+
+
+def dashboard_features(dash):
+    """Readable feature set: widget type sequence, JAQL columns, formula hashes, filter and normalized titles."""
+    widgets = dash.get("widgets", []) or []
+    if isinstance(widgets, dict):
+        widgets = widgets.get("widgets", [])
+
+    types = [w.get("type", "").lower() for w in widgets]
+    features = {f"type:{t}" for t in types}
+    features.update(f"seq:{a}>{b}" for a, b in zip(types, types[1:]))
+
+    for w in widgets:
+        for panel in w.get("metadata", {}).get("panels", []):
+            for item in panel.get("items", []):
+                jaql = item.get("jaql", {})
+                if jaql.get("formula"):
+                    features.add("formula:" + hashlib.sha1(_formula_key(jaql).encode("utf-8")).hexdigest()[:12])
+                elif jaql.get("dim") or jaql.get("column"):
+                    column = jaql.get("dim") or f"[{jaql.get('table', '')}.{jaql.get('column', '')}]"
+                    features.add(f"col:{column.lower()}")
+
+    features.update(f"filter:{f['title'].strip().lower()}" for f in extract_filters(dash.get("filters", [])))
+    features.add(f"title:{normalize_title(dash.get('title', ''))}")
+    return features
+
+
+def fingerprint(dash):
+    """Compact fingerprint: a frozenset of short feature hashes."""
+    return frozenset(_token(f) for f in dashboard_features(dash))
+
+
+# ------------------------- Index -------------------------
+class FingerprintIndex:
+    """Inverted index from fingerprint tokens to dashboard oids for one environment.
+
+    Candidates come from the rarer tokens of the query; only those candidates are
+    scored (Jaccard similarity of their fingerprints).
+    """
+
+    def __init__(self, common_ratio=0.2):
+        self.common_ratio = common_ratio
+        self.fingerprints = {}
+        self.titles = {}
+        self.postings = defaultdict(set)
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def add(self, oid, title, fp):
+        self.fingerprints[oid] = fp
+        self.titles[oid] = title
+        for token in fp:
+            self.postings[token].add(oid)
+
+    def candidates(self, fp, exclude=()):
+        # Excluded oids are dropped before pruning so they cannot use up the rare tokens.
+        limit = max(10, int(self.common_ratio * len(self.fingerprints)))
+        postings = [self.postings[t] - set(exclude) for t in fp if t in self.postings]
+        postings = [p for p in postings if p]
+        rare = [p for p in postings if len(p) <= limit] or postings
+        return set().union(*rare)
+
+    def query(self, fp, top=5, exclude=()):
+        """Best matches as ``[(oid, title, score)]``, highest score first."""
+        scored = []
+        for oid in self.candidates(fp, exclude):
+            other = self.fingerprints[oid]
+            union = len(fp | other)
+            scored.append((oid, self.titles[oid], len(fp & other) / union if union else 0.0))
+        scored.sort(key=lambda m: (-m[2], m[1]))
+        return scored[:top]
+
+
+def build_index(base_url, headers, max_workers=DEFAULT_MAX_WORKERS, cache=None, namespace=None):
+    """Fingerprint every dashboard in an environment; None if the listing fails.
+
+    With a shared ``cache``, fingerprints are reused until the dashboard's
+    ``lastUpdated`` changes, so only new or edited dashboards are fetched.
+    """
+    listing = list_dashboards(base_url, headers, fields=("oid", "title", "lastUpdated"))
+    if listing is None:
+        return None
+
+    def load(entry):
+        oid = entry["oid"]
+
+        def compute():
+            dash = load_dashboard(base_url, oid, headers)
+            return {"title": dash.get("title", ""), "fp": sorted(fingerprint(dash))} if dash else None
+
+        if cache is None:
+            return oid, compute()
+        return oid, cache.get_or_set(namespace, "fingerprint", f"{oid}:{entry.get('lastUpdated')}", compute, ttl=24 * 3600)
+
+    index = FingerprintIndex()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for oid, entry in pool.map(load, [d for d in listing if d.get("oid")]):
+            if entry:
+                index.add(oid, entry["title"], frozenset(entry["fp"]))
+    return index
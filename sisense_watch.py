@@ -0,0 +1,160 @@
+# Filename: sisense_watch.py
+#
+# Watch mode: polls each environment's dashboard listing and re-compares
+# dashboard pairs only when one of their dashboards actually changed.
+#
+# Usage:
+#   python sisense_watch.py watch_config.json --interval 300 --out reports
+#
+# Config format:
+#   {
+#     "environments": {
+#       "qa":   {"url": "https://qa-pa01.profitsage.net", "token_env": "SISENSE_QA_TOKEN"},
+#       "prod": {"url": "https://actabl-pa01.profitsage.net", "token": "..."}
+#     },
+#     "pairs": [
+#       {"name": "Revenue", "a": {"env": "qa", "dashboard": "<oid>"}, "b": {"env": "prod", "dashboard": "<oid>"}}
+#     ]
+#   }
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from sisense_compare_core import (
+    SECTIONS,
+    auth_headers,
+    diff_info,
+    extract_info,
+    list_dashboards,
+    load_dashboard,
+    payload_hash,
+)
+
+
+def load_config(path):
+    with open(path, encoding="utf-8") as fh:
+        config = json.load(fh)
+    for env in config.get("environments", {}).values():
+        token = env.get("token") or os.environ.get(env.get("token_env", ""), "")
+        env["headers"] = auth_headers(token)
+        env["url"] = env["url"].rstrip("/")
+    return config
+
+
+class DashboardWatcher:
+    """Keeps the last seen listing timestamp, payload hash and extraction per dashboard."""
+
+    def __init__(self, config):
+        self.envs = config["environments"]
+        self.pairs = config["pairs"]
+        self.watched = {}
+        for pair in self.pairs:
+            for side in ("a", "b"):
+                ref = pair[side]
+                self.watched.setdefault(ref["env"], set()).add(ref["dashboard"])
+        self.last_updated = {}
+        self.hashes = {}
+        self.infos = {}
+        self.diffs = {}
+
+    def poll_env(self, env_key):
+        """Return the watched dashboards in ``env_key`` whose content changed since the last poll."""
+        env = self.envs[env_key]
+        listing = list_dashboards(env["url"], env["headers"])
+        if listing is None:
+            print(f"⚠️ Could not list dashboards for {env_key}")
+            return set()
+
+        stamps = {d.get("oid"): d.get("lastUpdated") for d in listing}
+        changed = set()
+        for dash_id in self.watched[env_key]:
+            key = (env_key, dash_id)
+            stamp = stamps.get(dash_id)
+            if stamp is None:
+                # Deleted, hidden from this token or no lastUpdated field: re-check by hash every round.
+                print(f"⚠️ Dashboard {dash_id} has no lastUpdated in the {env_key} listing; re-fetching")
+            elif key in self.infos and stamp == self.last_updated.get(key):
+                continue
+            dash = load_dashboard(env["url"], dash_id, env["headers"])
+            if dash is None:
+                print(f"⚠️ Failed to load dashboard {dash_id} from {env_key}")
+                continue
+            digest = payload_hash(dash)
+            if digest == self.hashes.get(key):
+                self.last_updated[key] = stamp
+                continue
+            try:
+                info = extract_info(dash)
+            except Exception as e:
+                print(f"⚠️ Could not extract dashboard {dash_id} from {env_key}: {e}")
+                continue
+            self.last_updated[key] = stamp
+            self.hashes[key] = digest
+            self.infos[key] = info
+            changed.add(key)
+        return changed
+
+    def poll(self):
+        """One polling round: returns ``{pair name: diff}`` for the pairs that were recomputed."""
+        changed = set()
+        for env_key in self.watched:
+            changed |= self.poll_env(env_key)
+
+        recomputed = {}
+        for pair in self.pairs:
+            key_a = (pair["a"]["env"], pair["a"]["dashboard"])
+            key_b = (pair["b"]["env"], pair["b"]["dashboard"])
+            if not ({key_a, key_b} & changed) or key_a not in self.infos or key_b not in self.infos:
+                continue
+            try:
+                self.diffs[pair["name"]] = diff_info(self.infos[key_a], self.infos[key_b])
+            except Exception as e:
+                print(f"⚠️ Could not compare {pair['name']}: {e}")
+                continue
+            recomputed[pair["name"]] = self.diffs[pair["name"]]
+        return recomputed
+
+
+def write_report(out_dir, recomputed):
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(out_dir, f"diff_report_{stamp}.json")
+    report = {
+        "generated_at": stamp,
+        "pairs": {
+            name: {SECTIONS[section]: items for section, items in diff.items()}
+            for name, diff in recomputed.items()
+        },
+    }
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, default=list)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch Sisense dashboards for drift between environments.")
+    parser.add_argument("config", help="JSON file with environments and dashboard pairs")
+    parser.add_argument("--interval", type=int, default=300, help="Seconds between polls")
+    parser.add_argument("--out", default="reports", help="Directory for diff reports")
+    parser.add_argument("--once", action="store_true", help="Run a single poll and exit")
+    args = parser.parse_args()
+
+    watcher = DashboardWatcher(load_config(args.config))
+    while True:
+        recomputed = watcher.poll()
+        if recomputed:
+            drifted = [name for name, diff in recomputed.items() if diff]
+            path = write_report(args.out, recomputed)
+            for name in recomputed:
+                print(f"{'❌ Drift' if name in drifted else '✅ In sync'}: {name}")
+            print(f"📝 Report written to {path}")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import multiprocessing
+import sqlite3
+import time
+
+from sisense_cache import SqliteCache, cache_namespace
+
+
+def test_namespace_is_scoped_per_environment_and_token():
+    assert cache_namespace("https://qa-pa01.profitsage.net/") == cache_namespace("https://QA-PA01.profitsage.net")
+    assert cache_namespace("https://qa-pa01.profitsage.net") != cache_namespace("https://actabl-pa01.profitsage.net")
+    assert cache_namespace("https://qa-pa01.profitsage.net", "t1") == cache_namespace("https://qa-pa01.profitsage.net/", "t1")
+    assert cache_namespace("https://qa-pa01.profitsage.net", "t1") != cache_namespace("https://qa-pa01.profitsage.net", "t2")
+    assert cache_namespace("https://qa-pa01.profitsage.net", "t1") != cache_namespace("https://qa-pa01.profitsage.net")
+
+
+def test_round_trip_keeps_tuples_and_sets(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite"))
+    value = {"pivots": [("values", "Revenue", "SUM([Rev])")], "fp": frozenset({"a1", "b2"})}
+    cache.set("ns", "info", "k", value)
+    assert cache.get("ns", "info", "k") == value
+
+
+def test_hits_do_not_write_until_flushed(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    cache = SqliteCache(path)
+    cache.set("ns", "dashboard", "d1:1", {"oid": "d1"})
+
+    writer = sqlite3.connect(path, timeout=0)
+    writer.execute("BEGIN IMMEDIATE")  # hold the write lock; reads must still succeed
+    assert cache.get("ns", "dashboard", "d1:1") == {"oid": "d1"}
+    writer.rollback()
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 0)
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite"), max_bytes=400)
+    cache.set("ns", "dashboard", "old", {"x": 1}, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("ns", "dashboard", "old") is None
+
+    for i in range(20):
+        cache.set("ns", "dashboard", str(i), {"blob": "%032x" % (i * 7919) * 3})
+    stats = cache.stats()
+    assert stats["bytes"] <= 400
+    assert stats["evictions"] > 0
+    assert cache.get("ns", "dashboard", "19") is not None
+    assert cache.get("ns", "dashboard", "0") is None
+
+
+def _writer(path, worker):
+    cache = SqliteCache(path, max_bytes=5000)
+    for i in range(30):
+        cache.set("ns", "dashboard", f"{worker}-{i}", {"i": i})
+        cache.get("ns", "dashboard", f"{worker}-{i}")
+    cache.flush()  # forked children exit without running atexit hooks
+
+
+def test_processes_share_one_file(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    SqliteCache(path)
+    procs = [multiprocessing.Process(target=_writer, args=(path, w)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert [p.exitcode for p in procs] == [0, 0, 0, 0]
+    stats = SqliteCache(path).stats()
+    assert stats["sets"] == 120
+    assert stats["hits"] == 120
@@ -0,0 +1,73 @@
+from sisense_compare_core import diff_filters, extract_filters
+
+
+def member_filter(title, dim, members, exclude=False, level=None):
+    jaql = {"title": title, "dim": dim, "filter": {"exclude": {"members": members}} if exclude else {"members": members}}
+    if level:
+        jaql["level"] = level
+    return {"jaql": jaql}
+
+
+def test_exclude_and_include_of_same_members_differ():
+    a = extract_filters([member_filter("Property", "[P.Name]", ["A", "B"])])
+    b = extract_filters([member_filter("Property", "[P.Name]", ["A", "B"], exclude=True)])
+
+    [change] = diff_filters(a, b)
+    assert change["definition_a"] == "Include 2 member(s)"
+    assert change["definition_b"] == "Exclude 2 member(s)"
+    assert change["removed"] == [] and change["added"] == []
+
+
+def test_date_range_change():
+    def date_filter(start, end):
+        return {"jaql": {"title": "Date", "dim": "[D.Date]", "level": "days", "filter": {"from": start, "to": end}}}
+
+    a = extract_filters([date_filter("2024-01-01", "2024-12-31")])
+    b = extract_filters([date_filter("2024-01-01", "2024-06-30")])
+
+    [change] = diff_filters(a, b)
+    assert change["definition_a"] == "2024-01-01 → 2024-12-31"
+    assert change["definition_b"] == "2024-01-01 → 2024-06-30"
+
+
+def test_cascading_levels_are_compared_per_level():
+    def cascade(cities):
+        return {"levels": [
+            {"title": "Region", "dim": "[G.Region]", "filter": {"members": ["East"]}},
+            {"title": "City", "dim": "[G.City]", "filter": {"members": cities}},
+        ]}
+
+    a = extract_filters([cascade(["Boston", "Albany"])])
+    b = extract_filters([cascade(["Boston"])])
+
+    assert [f["title"] for f in a] == ["Region / City › Region", "Region / City › City"]
+    [change] = diff_filters(a, b)
+    assert change["filter"] == "Region / City › City"
+    assert change["removed"] == ["Albany"] and change["added"] == []
+
+
+def test_large_member_list_reports_only_changed_members():
+    members = [f"Property {i}" for i in range(20000)]
+    a = extract_filters([member_filter("Property", "[P.Name]", members)])
+    b = extract_filters([member_filter("Property", "[P.Name]", members[2:] + ["New 1", "New 2", "New 3"])])
+
+    [change] = diff_filters(a, b)
+    assert change["definition_a"] == ""
+    assert change["removed"] == ["Property 0", "Property 1"]
+    assert change["added"] == ["New 1", "New 2", "New 3"]
+
+
+def test_same_title_at_different_levels_does_not_collide():
+    a = extract_filters([
+        member_filter("Date", "[D.Date]", ["2024"], level="years"),
+        member_filter("Date", "[D.Date]", ["2024-01"], level="months"),
+    ])
+    b = extract_filters([
+        member_filter("Date", "[D.Date]", ["2024"], level="years"),
+        member_filter("Date", "[D.Date]", ["2024-02"], level="months"),
+    ])
+
+    assert len({f["key"] for f in a}) == 2
+    [change] = diff_filters(a, b)
+    assert change["filter"] == "Date (months)"
+    assert change["removed"] == ["2024-01"] and change["added"] == ["2024-02"]
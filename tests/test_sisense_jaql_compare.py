@@ -0,0 +1,193 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from sisense_jaql_compare import build_widget_jaql, compare_data
+
+
+class MockJaqlServer:
+    """Local JAQL endpoint: ``/<env>/api/datasources/<ds>/jaql`` serves ``tables[env]``.
+
+    Unsorted queries come back in reverse order for environments listed in
+    ``unstable`` to mimic engines that do not guarantee row order.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.unstable = set()
+        self.queries = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                env = self.path.strip("/").split("/")[0]
+                query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.queries.append((env, query))
+                headers, rows = server.tables[env]
+                rows = list(rows)
+                if any(m["jaql"].get("sort") for m in query["metadata"] if m.get("panel") != "scope"):
+                    rows.sort()
+                elif env in server.unstable:
+                    rows.reverse()
+                offset = query.get("offset", 0)
+                rows = rows[offset:offset + query["count"]] if query.get("count") else rows[offset:]
+                body = json.dumps({
+                    "headers": headers,
+                    "values": [[{"data": v, "text": str(v)} for v in row] for row in rows],
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def dashboard(self, env, widgets=None, filters=None):
+        return {"url": f"{self.base}/{env}", "headers": {}, "dash": {
+            "title": "QA", "filters": filters or [], "widgets": widgets or [pivot()],
+        }}
+
+
+def pivot(title="Revenue", ignore=None):
+    metadata = {"panels": [
+        {"name": "rows", "items": [{"jaql": {"dim": "[H.Hotel]"}}]},
+        {"name": "values", "items": [{"jaql": {"dim": "[H.Rev]", "agg": "sum"}}]},
+    ]}
+    if ignore is not None:
+        metadata["ignore"] = ignore
+    return {"title": title, "type": "pivot2", "datasource": {"title": "Hotels"}, "metadata": metadata}
+
+
+@pytest.fixture
+def server():
+    srv = MockJaqlServer()
+    yield srv
+    srv.httpd.shutdown()
+
+
+def rows(n, last=None):
+    data = [[f"h{i:04d}", i] for i in range(n)]
+    if last is not None:
+        data[-1][1] = last
+    return data
+
+
+def test_difference_beyond_sample_is_reported(server):
+    server.tables["qa"] = (["Hotel", "Revenue"], rows(1000))
+    server.tables["prod"] = (["Hotel", "Revenue"], rows(1000, last=-1))
+    result = compare_data([server.dashboard("qa"), server.dashboard("prod")], row_limit=5000, sample_rows=100)
+
+    status = {r["column"]: r["status"] for r in result["columns"]}
+    assert status["Revenue"] == ["✅", "❌"]
+    assert status["Hotel"] == ["✅", "✅"]
+    [diff] = result["row_diffs"]
+    assert diff["only_in_a"] == [("h0999", "999")]
+    assert diff["only_in_b"] == [("h0999", "-1")]
+
+
+def test_large_results_are_paged_not_refetched(server):
+    server.tables["qa"] = (["Hotel", "Revenue"], rows(1000))
+    server.tables["prod"] = (["Hotel", "Revenue"], rows(1000))
+    result = compare_data([server.dashboard("qa"), server.dashboard("prod")], row_limit=5000, sample_rows=100)
+
+    assert all(r["status"] == ["✅", "✅"] and r["truncated"] == [] for r in result["columns"])
+    pages = sorted((env, q.get("offset", 0), q["count"]) for env, q in server.queries)
+    assert pages == [("prod", 0, 100), ("prod", 100, 4900), ("qa", 0, 100), ("qa", 100, 4900)]
+
+
+def test_small_results_are_settled_by_the_sample(server):
+    server.tables["qa"] = (["Hotel", "Revenue"], rows(20))
+    server.tables["prod"] = (["Hotel", "Revenue"], rows(20, last=-1))
+    result = compare_data([server.dashboard("qa"), server.dashboard("prod")], row_limit=5000, sample_rows=100)
+
+    assert len(server.queries) == 2
+    [diff] = result["row_diffs"]
+    assert diff["only_in_b"] == [("h0019", "-1")]
+
+
+def test_identical_data_in_different_order_matches(server):
+    server.tables["qa"] = (["Hotel", "Revenue"], rows(300))
+    server.tables["prod"] = (["Hotel", "Revenue"], rows(300))
+    server.unstable.add("prod")
+    result = compare_data([server.dashboard("qa"), server.dashboard("prod")], row_limit=5000, sample_rows=50)
+
+    assert all(r["status"] == ["✅", "✅"] for r in result["columns"])
+    assert result["row_diffs"] == []
+    assert all(m["jaql"]["sort"] == "asc" for _, q in server.queries for m in q["metadata"][:1])
+
+
+def test_values_swapped_between_rows_are_reported(server):
+    server.tables["qa"] = (["Hotel", "Revenue"], [["h1", 1], ["h2", 2]])
+    server.tables["prod"] = (["Hotel", "Revenue"], [["h1", 2], ["h2", 1]])
+    result = compare_data([server.dashboard("qa"), server.dashboard("prod")])
+
+    status = {r["column"]: r["status"] for r in result["columns"]}
+    assert status["Hotel"] == ["✅", "✅"]
+    assert status["Revenue"] == ["✅", "❌"]
+    [diff] = result["row_diffs"]
+    assert diff["only_in_a"] == [("h1", "1"), ("h2", "2")]
+    assert diff["only_in_b"] == [("h1", "2"), ("h2", "1")]
+
+
+def test_result_cut_off_at_row_limit_is_flagged(server):
+    server.tables["qa"] = (["Hotel", "Revenue"], rows(200))
+    server.tables["prod"] = (["Hotel", "Revenue"], rows(200))
+    result = compare_data([server.dashboard("qa"), server.dashboard("prod")], row_limit=100, sample_rows=10)
+
+    assert all(r["truncated"] == [0, 1] for r in result["columns"])
+
+
+def test_different_column_counts_keep_headers_per_side(server):
+    server.tables["qa"] = (["Hotel", "Revenue", "Rooms"], [["h1", 1, 5]])
+    server.tables["prod"] = (["Hotel", "Revenue"], [["h1", 1]])
+    result = compare_data([server.dashboard("qa"), server.dashboard("prod")])
+
+    [diff] = result["row_diffs"]
+    assert diff["headers_a"] == ["Hotel", "Revenue", "Rooms"]
+    assert diff["headers_b"] == ["Hotel", "Revenue"]
+    assert all(len(r) == len(diff["headers_a"]) for r in diff["only_in_a"])
+    assert all(len(r) == len(diff["headers_b"]) for r in diff["only_in_b"])
+
+
+def test_results_are_positional_for_equal_titles(server):
+    for env in ("qa", "prod", "uat"):
+        server.tables[env] = (["Hotel", "Revenue"], rows(3))
+    server.tables["uat"] = (["Hotel", "Revenue"], rows(3, last=0))
+    dashboards = [server.dashboard(env) for env in ("qa", "prod", "uat")]
+    result = compare_data(dashboards)
+
+    status = {r["column"]: r["status"] for r in result["columns"]}
+    assert status["Revenue"] == ["✅", "✅", "❌"]
+    assert [d["other"] for d in result["row_diffs"]] == [2]
+
+
+def test_widgets_with_equal_titles_are_diffed_separately(server):
+    server.tables["qa"] = (["Hotel", "Revenue"], rows(3))
+    server.tables["prod"] = (["Hotel", "Revenue"], rows(3, last=0))
+    widgets = [pivot("Revenue"), pivot("Revenue")]
+    result = compare_data([server.dashboard("qa", widgets), server.dashboard("prod", widgets)])
+
+    assert sorted(d["widget"] for d in result["row_diffs"]) == ["Revenue", "Revenue #2"]
+
+
+def test_widget_ignore_drops_dashboard_filters():
+    filters = [
+        {"instanceid": "f1", "jaql": {"dim": "[H.Region]", "filter": {"members": ["East"]}}},
+        {"instanceid": "f2", "jaql": {"dim": "[H.Brand]", "filter": {"members": ["X"]}}},
+    ]
+
+    def scope_dims(widget):
+        query = build_widget_jaql(widget, filters)
+        return [m["jaql"]["dim"] for m in query["metadata"] if m.get("panel") == "scope"]
+
+    assert scope_dims(pivot()) == ["[H.Region]", "[H.Brand]"]
+    assert scope_dims(pivot(ignore={"all": True})) == []
+    assert scope_dims(pivot(ignore={"dimensions": ["[H.Region]"]})) == ["[H.Brand]"]
+    assert scope_dims(pivot(ignore={"ids": ["f2"]})) == ["[H.Region]"]
@@ -0,0 +1,91 @@
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sisense_cache import SqliteCache
+from sisense_matcher import FingerprintIndex, build_index, fingerprint, normalize_title
+
+
+def dashboard(title, dims):
+    widgets = [{"type": "pivot2", "metadata": {"panels": [{"name": "rows", "items": [{"jaql": {"dim": d}} for d in dims]}]}}]
+    return {"title": title, "widgets": widgets, "filters": []}
+
+
+def test_normalize_title_strips_only_copy_markers():
+    assert normalize_title("Revenue (1)") == "revenue"
+    assert normalize_title("Revenue - Copy") == "revenue"
+    assert normalize_title("Revenue_qa") == "revenue"
+    assert normalize_title("Budget - 2023") != normalize_title("Budget - 2024")
+
+
+def test_query_prefers_matching_year():
+    index = FingerprintIndex()
+    index.add("b23", "Budget - 2023", fingerprint(dashboard("Budget - 2023", ["[B.Amount]"])))
+    index.add("b24", "Budget - 2024", fingerprint(dashboard("Budget - 2024", ["[B.Amount]"])))
+
+    [best, runner_up] = index.query(fingerprint(dashboard("Budget - 2024 (1)", ["[B.Amount]"])))
+    assert best[0] == "b24" and best[2] == 1.0
+    assert runner_up[0] == "b23" and runner_up[2] < 1.0
+
+
+def test_candidates_skip_tokens_shared_by_most_dashboards():
+    index = FingerprintIndex()
+    for i in range(30):
+        index.add(f"r{i}", f"Report {i}", fingerprint(dashboard(f"Report {i}", ["[B.Amount]"])))
+
+    # The widget type and column tokens are on all 30 dashboards, above the limit of 10.
+    fp = fingerprint(dashboard("Report 7 (1)", ["[B.Amount]"]))
+    assert index.candidates(fp) == {"r7"}
+    assert index.query(fp)[0][0] == "r7"
+
+
+def test_query_exclude_falls_back_to_other_candidates():
+    index = FingerprintIndex()
+    for i in range(30):
+        index.add(f"r{i}", f"Report {i}", fingerprint(dashboard(f"Report {i}", ["[B.Amount]"])))
+
+    matches = index.query(fingerprint(dashboard("Report 7", ["[B.Amount]"])), top=3, exclude={"r7"})
+    assert len(matches) == 3
+    assert "r7" not in [oid for oid, _, _ in matches]
+
+
+def test_build_index_reuses_cached_fingerprints(tmp_path):
+    dashboards = {
+        "b23": dict(dashboard("Budget - 2023", ["[B.Amount]"]), oid="b23", lastUpdated="1"),
+        "b24": dict(dashboard("Budget - 2024", ["[B.Amount]"]), oid="b24", lastUpdated="1"),
+    }
+    fetched = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+            if len(parts) == 3:
+                body = [{"oid": oid, "title": d["title"], "lastUpdated": d["lastUpdated"]} for oid, d in dashboards.items()]
+            elif len(parts) == 4:
+                fetched[parts[3]] += 1
+                body = {k: v for k, v in dashboards[parts[3]].items() if k != "widgets"}
+            else:
+                body = dashboards[parts[3]]["widgets"]
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_port}"
+    cache = SqliteCache(str(tmp_path / "cache.sqlite"))
+    try:
+        index = build_index(base, {}, cache=cache, namespace="ns")
+        assert len(index) == 2 and fetched == {"b23": 1, "b24": 1}
+        assert index.query(fingerprint(dashboards["b24"]))[0][0] == "b24"
+
+        dashboards["b24"]["lastUpdated"] = "2"
+        index = build_index(base, {}, cache=cache, namespace="ns")
+        assert len(index) == 2 and fetched == {"b23": 1, "b24": 2}
+    finally:
+        httpd.shutdown()
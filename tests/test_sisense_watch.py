@@ -0,0 +1,96 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from sisense_compare_core import list_dashboards, load_dashboard
+from sisense_watch import DashboardWatcher
+
+
+class MockSisense:
+    """Serves ``dashboards[env][oid]`` under ``/<env>/api/v1/dashboards``."""
+
+    def __init__(self):
+        self.dashboards = {}
+        self.listed = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                env = server.dashboards[parts[0]]
+                if len(parts) == 4:
+                    body = [{"oid": oid, "lastUpdated": d.get("lastUpdated")}
+                            for oid, d in env.items() if server.listed.get(oid, True)]
+                elif len(parts) == 5:
+                    body = env[parts[4]]
+                else:
+                    body = []
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def sisense():
+    srv = MockSisense()
+    srv.dashboards = {
+        "qa": {"d1": {"oid": "d1", "title": "Rev", "lastUpdated": "1", "filters": [{"jaql": {"title": "Property"}}]}},
+        "prod": {"d2": {"oid": "d2", "title": "Rev", "lastUpdated": "1", "filters": [{"jaql": {"title": "Property"}}]}},
+    }
+    yield srv
+    srv.httpd.shutdown()
+
+
+def watcher(srv):
+    return DashboardWatcher({
+        "environments": {env: {"url": f"{srv.base}/{env}", "headers": {}} for env in ("qa", "prod")},
+        "pairs": [{"name": "Rev", "a": {"env": "qa", "dashboard": "d1"}, "b": {"env": "prod", "dashboard": "d2"}}],
+    })
+
+
+def test_dashboard_missing_from_listing_is_still_checked(sisense):
+    sisense.listed["d2"] = False
+    w = watcher(sisense)
+    assert w.poll() == {"Rev": {}}
+
+    sisense.dashboards["prod"]["d2"]["filters"].append({"jaql": {"title": "Date"}})
+    assert w.poll() == {"Rev": {"filters": {"only_in_a": [], "only_in_b": ["Date"]}}}
+
+
+def test_malformed_payload_does_not_stop_the_watcher(sisense):
+    w = watcher(sisense)
+    w.poll()
+
+    sisense.dashboards["prod"]["d2"].update(lastUpdated="2", filters=[{"jaql": None}])
+    assert w.poll() == {}
+
+    sisense.dashboards["prod"]["d2"].update(lastUpdated="3", filters=[{"jaql": {"title": "Date"}}])
+    diff = w.poll()["Rev"]
+    assert diff["filters"] == {"only_in_a": ["Property"], "only_in_b": ["Date"]}
+
+
+def test_hung_connection_times_out():
+    # Accepts connections but never answers.
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    base = f"http://127.0.0.1:{listener.getsockname()[1]}"
+    try:
+        started = time.time()
+        assert list_dashboards(base, {}, timeout=0.2) is None
+        assert load_dashboard(base, "d1", {}, timeout=0.2) is None
+        assert time.time() - started < 5
+    finally:
+        listener.close()